@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+"""
+
+Alert detector throughput benchmark.
+
+Feeds synthetic logs (50 per second of log time) through AlertDetector
+and reports logs processed per second on a single core.
+
+Usage:
+    $ python benchmarks/alerts.py --logs 300000 --bids 2000 --max-keys 1000
+
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logjuggler import alerts  # noqa
+from logjuggler import logjuggler  # noqa
+
+
+LEVELS = ('DEBUG', 'INFO', 'WARN', 'ERROR')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alert detector throughput benchmark.")
+    parser.add_argument('--logs', type=int, default=300000, help='Number of logs.')
+    parser.add_argument('--bids', type=int, default=2000, help='Number of business ids.')
+    parser.add_argument('--max-keys', dest='max_keys', type=int, default=1000,
+                        help='Max number of tracked keys.')
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    start = datetime.datetime(2012, 9, 13)
+    bids = [str(i) for i in range(args.bids)]
+    logs = [logjuggler.Log(start + datetime.timedelta(seconds=i // 50), rnd.choice(LEVELS),
+                           '34523', rnd.choice(bids), '65d33', 'message')
+            for i in range(args.logs)]
+
+    detector = alerts.AlertDetector([alerts.ThresholdRule(20), alerts.RateRule(3)],
+                                    max_keys=args.max_keys)
+    began = time.time()
+    fired = sum(1 for _ in detector.run(logs))
+    elapsed = time.time() - began
+    print("{0} logs in {1:.3f}s: {2:.0f} logs/s, {3} alerts, {4} evicted keys".format(
+        args.logs, elapsed, args.logs / elapsed, fired, detector.evictions))
+
+
+if __name__ == "__main__":
+    main()
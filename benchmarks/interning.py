@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""
+
+String interning benchmark.
+
+Parses synthetic log lines with and without interning of level and ids,
+then reports memory held by those fields and the speed of id filters
+against the previous filters that converted the id with str() per call.
+
+Usage:
+    $ python benchmarks/interning.py --lines 200000
+
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logjuggler import formats  # noqa
+from logjuggler import logjuggler  # noqa
+
+
+LEVELS = ('DEBUG', 'INFO', 'WARN', 'ERROR')
+
+
+def make_lines(count, ids=1000):
+    rnd = random.Random(42)
+    template = "2012-09-13 16:{0:02d}:{1:02d} {2} SID:{3} BID:{4} RID:{5:x} 'Message {6}'"
+    return [template.format(i // 60 % 60, i % 60, rnd.choice(LEVELS), rnd.randint(1, ids),
+                            rnd.randint(1, ids // 10), rnd.randint(1, ids * 10), i)
+            for i in range(count)]
+
+
+def field_bytes(logs):
+    """Return bytes held by distinct level and id objects of the logs."""
+    seen = {}
+    for log in logs:
+        for value in log[1:5]:
+            seen[id(value)] = sys.getsizeof(value)
+    return sum(seen.values())
+
+
+def legacy_session_id_filter(sid):
+    def inner(log_line):
+        if log_line.session_id == str(sid):
+            return log_line
+    return inner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="String interning benchmark.")
+    parser.add_argument('--lines', type=int, default=200000, help='Number of log lines.')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per measurement.')
+    args = parser.parse_args()
+
+    lines = make_lines(args.lines)
+    log_format = formats.get_format('default')
+    for intern_fields in (False, True):
+        extract = log_format.extractor(logjuggler.Log._make, intern_fields)
+        parse_time = min(timeit.repeat(lambda: [extract(line) for line in lines],
+                                       number=1, repeat=args.runs))
+        logs = [extract(line) for line in lines]
+        print("intern={0!s:<6} parse: {1:.3f}s  level/id memory: {2:.1f} KiB".format(
+            intern_fields, parse_time, field_bytes(logs) / 1024.0))
+
+    sid = int(logs[0].session_id)
+    for name, factory in (('str() per call', legacy_session_id_filter),
+                          ('interned', logjuggler.session_id_filter)):
+        query_filter = factory(sid)
+        filter_time = min(timeit.repeat(lambda: [query_filter(log) for log in logs],
+                                        number=1, repeat=args.runs))
+        print("sid filter, {0:<15} {1:.3f}s".format(name + ':', filter_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+"""
+
+Command line startup benchmark.
+
+Compares the ways of starting the command line (the script, python -m
+logjuggler and the installed logjuggler command, if it is on PATH) and
+the cost of running many small queries as separate processes with
+answering them in one process with the batch subcommand.
+
+Console script wrappers generated for egg and develop installs
+(setup.py install/develop, pip install -e) look main up with
+pkg_resources, which scans every installed distribution and dominates
+the startup time. Wrappers generated for wheel installs (pip install .)
+import main directly.
+
+Usage:
+    $ python benchmarks/startup.py --runs 20
+
+"""
+
+import argparse
+import distutils.spawn
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'logjuggler', 'logjuggler.py')
+LOG_FILE = os.path.join(ROOT, 'data', 'app.log')
+QUERIES = ['loglevel ERROR', 'sid 34523', 'bid 319', 'rid 65d33',
+           "date '2012-09-13 16:04:00' '2012-09-13 16:05:00'"]
+
+
+def timed(cmd, runs, stdin=None):
+    """Return (min, avg) wall time of running cmd (list) runs times."""
+    samples = []
+    with open(os.devnull, 'w') as devnull:
+        for _ in range(runs):
+            start = time.time()
+            subprocess.check_call(cmd, stdout=devnull, stdin=stdin, cwd=ROOT)
+            samples.append(time.time() - start)
+            if stdin is not None:
+                stdin.seek(0)
+    return min(samples), sum(samples) / len(samples)
+
+
+def report(name, stats):
+    print("{name:<40}min: {0:.4f}s  avg: {1:.4f}s".format(*stats, name=name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Command line startup benchmark.")
+    parser.add_argument('--runs', type=int, default=10, help='Runs per measurement.')
+    args = parser.parse_args()
+
+    python = sys.executable
+    report('interpreter', timed([python, '-c', 'pass'], args.runs))
+    report('import logjuggler', timed(
+        [python, '-c', 'import logjuggler.logjuggler'], args.runs))
+
+    commands = [('script', [python, SCRIPT]),
+                ('python -m logjuggler', [python, '-m', 'logjuggler'])]
+    command = distutils.spawn.find_executable('logjuggler')
+    if command is not None:
+        commands.append(('logjuggler command', [command]))
+    for name, cmd in commands:
+        report('single query, ' + name, timed(
+            cmd + ['-f', LOG_FILE, 'loglevel', 'ERROR'], args.runs))
+
+    cli = [python, '-m', 'logjuggler', '-f', LOG_FILE]
+    separate = [timed(cli + shlex.split(query), args.runs) for query in QUERIES]
+    report('{0} queries, one per run'.format(len(QUERIES)),
+           (sum(s[0] for s in separate), sum(s[1] for s in separate)))
+
+    with tempfile.TemporaryFile(mode='w+') as queries:
+        queries.write('\n'.join(QUERIES) + '\n')
+        queries.seek(0)
+        report('{0} queries, batch'.format(len(QUERIES)), timed(
+            cli + ['batch'], args.runs, stdin=queries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+
+Command line entry point for python -m logjuggler.
+
+Runs the same main() as the logjuggler console script without the
+pkg_resources lookup done by console script wrappers generated for
+egg and develop installs.
+
+"""
+
+import sys
+
+from .logjuggler import main
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+
+Error rate alerting over live logs.
+
+Logs are counted per (business_id, level) in sliding windows driven by
+log timestamps. Each key keeps a ring of bucket counts for the current
+and the previous window, so memory per key is constant and every log
+costs O(1). The number of keys is bounded, the least recently seen keys
+are evicted first.
+
+Alerts are edge triggered: a rule fires once when it starts to hold for
+a key and is re-armed when it stops holding.
+
+Usage:
+    >>> import alerts, logjuggler
+    >>> detector = alerts.AlertDetector(rules=[alerts.ThresholdRule(10), alerts.RateRule(3)])
+    >>> logs = logjuggler.parse_log_lines(alerts.follow_log_file('/var/log/app.log'))
+    >>> alerts.write_alerts(detector.run(logs), sys.stdout)
+
+The same from the command line:
+
+    $ logjuggler -f /var/log/app.log --format default alert --threshold 10 --rate 3 --follow
+    {"business_id": "1329", "count": 10, "level": "ERROR", "previous": 2, "rule": "threshold", ...}
+
+"""
+
+import datetime
+import json
+import os
+import time
+
+import logjuggler
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def follow_log_file(file, poll_interval=1.0, idle_timeout=None):
+    """Return a generator that yields lines of a growing log file (tail -F).
+
+    Lines are yielded once complete, a rotated or truncated file is
+    reopened and read from the beginning.
+
+    Args:
+        file: str, location of the log file
+        poll_interval: float, seconds to sleep when there is no new data
+        idle_timeout: float or None, stop after that many seconds without
+                      new data, None follows forever
+
+    Raises:
+        IOError if the file can not be opened.
+
+    """
+    f = open(file, 'r')
+    inode = os.fstat(f.fileno()).st_ino
+    partial = ''
+    idle = 0.0
+    try:
+        while True:
+            line = f.readline()
+            if line:
+                idle = 0.0
+                if line.endswith('\n'):
+                    yield (partial + line).rstrip('\r\n')
+                    partial = ''
+                else:
+                    partial += line
+                continue
+
+            try:
+                stat = os.stat(file)
+            except OSError:
+                stat = None
+            if stat is not None and (stat.st_ino != inode or stat.st_size < f.tell()):
+                f.close()
+                f = open(file, 'r')
+                inode = os.fstat(f.fileno()).st_ino
+                partial = ''
+                continue
+
+            if idle_timeout is not None and idle >= idle_timeout:
+                return
+            time.sleep(poll_interval)
+            idle += poll_interval
+    finally:
+        f.close()
+
+
+def levels_filter(levels):
+    """Return a func that filters logs with any of the given levels.
+
+    Args:
+        levels: iterable of str
+
+    """
+    filters = [logjuggler.log_level_filter(level) for level in levels]
+
+    def inner(log_line):
+        for level_filter in filters:
+            if level_filter(log_line):
+                return log_line
+    return inner
+
+
+def window_buckets(window, buckets):
+    """Return the number of buckets that split the window exactly.
+
+    Args:
+        window: int, window length in seconds
+        buckets: int, max number of buckets
+
+    Returns:
+        int, the largest divisor of window not greater than buckets
+
+    Raises:
+        ValueError if window or buckets is smaller than 1.
+
+    """
+    if window < 1 or buckets < 1:
+        raise ValueError("Window ({window}s) and buckets ({buckets}) must be positive".format(
+            window=window, buckets=buckets))
+    buckets = min(buckets, window)
+    while window % buckets:
+        buckets -= 1
+    return buckets
+
+
+class SlidingWindowCounter(object):
+
+    """Event counter over the current and the previous time window.
+
+    Args:
+        window: int, window length in seconds
+        buckets: int, max number of buckets per window, more buckets slide
+                 smoother, see window_buckets
+
+    """
+
+    __slots__ = ('width', 'buckets', 'counts', 'head', 'current', 'previous')
+
+    def __init__(self, window, buckets):
+        buckets = window_buckets(window, buckets)
+        self.width = window // buckets
+        self.buckets = buckets
+        self.counts = [0] * (2 * buckets)
+        self.head = None
+        self.current = 0
+        self.previous = 0
+
+    def add(self, seconds):
+        """Count an event at the given time (seconds since epoch)."""
+        bucket = int(seconds) // self.width
+        if self.head is None:
+            self.head = bucket
+        elif bucket > self.head:
+            self._advance(bucket)
+
+        age = self.head - bucket
+        if age < self.buckets:
+            self.current += 1
+        elif age < 2 * self.buckets:
+            self.previous += 1
+        else:
+            # older than both windows
+            return
+        self.counts[bucket % len(self.counts)] += 1
+
+    def _advance(self, bucket):
+        counts, size = self.counts, len(self.counts)
+        if bucket - self.head >= size:
+            self.counts = [0] * size
+            self.current = self.previous = 0
+            self.head = bucket
+            return
+        while self.head < bucket:
+            self.head += 1
+            # the oldest bucket leaves the previous window and is reused
+            self.previous -= counts[self.head % size]
+            counts[self.head % size] = 0
+            # a bucket moves from the current to the previous window
+            moved = counts[(self.head - self.buckets) % size]
+            self.current -= moved
+            self.previous += moved
+
+
+class ThresholdRule(object):
+
+    """Fires when a window holds at least count logs."""
+
+    name = 'threshold'
+
+    def __init__(self, count):
+        self.count = count
+
+    def check(self, current, previous):
+        return current >= self.count
+
+
+class RateRule(object):
+
+    """Fires when a window holds factor times more logs than the previous one.
+
+    Windows with less than min_count logs never fire.
+
+    """
+
+    name = 'rate'
+
+    def __init__(self, factor, min_count=5):
+        self.factor = factor
+        self.min_count = min_count
+
+    def check(self, current, previous):
+        return current >= self.min_count and current >= self.factor * previous
+
+
+class _KeyState(object):
+
+    """Counter and firing rules of a single (business_id, level) key."""
+
+    __slots__ = ('counter', 'firing', 'seen')
+
+    def __init__(self, counter):
+        self.counter = counter
+        self.firing = set()
+        self.seen = 0
+
+
+class AlertDetector(object):
+
+    """Streaming alert detector.
+
+    Args:
+        rules: list of rules (ThresholdRule, RateRule or objects with
+               name attribute and check(current, previous) method)
+        levels: iterable of watched log levels
+        window: int, window length in seconds
+        buckets: int, max number of buckets per window, see window_buckets
+        max_keys: int, max number of tracked (business_id, level) keys
+
+    """
+
+    def __init__(self, rules, levels=('ERROR', 'WARN'), window=60, buckets=6,
+                 max_keys=10000):
+        self.rules = list(rules)
+        self.levels = tuple(str(level).upper() for level in levels)
+        self.log_filter = levels_filter(self.levels)
+        self.window = window
+        self.buckets = window_buckets(window, buckets)
+        self.max_keys = max_keys
+        self.keys = {}
+        self.evictions = 0
+        self._seen = 0
+
+    def process(self, log):
+        """Count a log (Log obj with datetime date), return a list of alerts (dicts)."""
+        if not self.log_filter(log):
+            return []
+
+        key = (log.business_id, log.level)
+        state = self.keys.get(key)
+        if state is None:
+            if len(self.keys) >= self.max_keys:
+                self._evict()
+            state = self.keys[key] = _KeyState(SlidingWindowCounter(self.window, self.buckets))
+        self._seen += 1
+        state.seen = self._seen
+
+        counter = state.counter
+        # timedelta.total_seconds is Python 2.7+, whole seconds are enough
+        delta = log.date - EPOCH
+        counter.add(delta.days * 86400 + delta.seconds)
+
+        alerts = []
+        for rule in self.rules:
+            if rule.check(counter.current, counter.previous):
+                if rule.name not in state.firing:
+                    state.firing.add(rule.name)
+                    alerts.append({
+                        'time': logjuggler.time_to_iso(log.date),
+                        'business_id': log.business_id,
+                        'level': log.level,
+                        'rule': rule.name,
+                        'count': counter.current,
+                        'previous': counter.previous,
+                        'window': self.window,
+                    })
+            else:
+                state.firing.discard(rule.name)
+        return alerts
+
+    def _evict(self):
+        # drop the least recently seen tenth at once, so a stream of new
+        # keys does not sort all the keys on every log
+        count = max(1, self.max_keys // 10)
+        oldest = sorted(self.keys, key=lambda key: self.keys[key].seen)[:count]
+        for key in oldest:
+            del self.keys[key]
+        self.evictions += len(oldest)
+
+    def run(self, logs):
+        """Return a generator that yields alerts (dicts) for the given logs."""
+        for log in logs:
+            for alert in self.process(log):
+                yield alert
+
+
+def write_alerts(alerts, stream):
+    """Write alerts (dicts) as JSON lines to the given stream."""
+    for alert in alerts:
+        stream.write(json.dumps(alert, sort_keys=True) + '\n')
+        stream.flush()
@@ -0,0 +1,261 @@
+"""
+
+In-process cache for search results.
+
+Results are cached per (file identity, byte range, normalized query).
+A file is identified by its path, device and inode, so a rotated log
+file is never confused with its predecessor, and the bytes at both ends
+of the scanned range are compared on every lookup to catch files
+rewritten in place. Open ended queries (no end offset) and ranges
+reaching past the end of the file remember how far the file was
+scanned; when the file grows only the new tail is scanned and merged
+into the cached results. A trailing line without a newline is returned
+but not cached, it is scanned again until it is complete.
+
+Usage:
+    >>> from cache import QueryCache
+    >>> cache = QueryCache(maxsize=64)
+    >>> errors = cache.get_log_level('ERROR', '../data/app.log')
+    >>> errors = cache.get_log_level('error', '../data/app.log')
+    >>> cache.cache_info()
+    CacheInfo(hits=1, misses=1, updates=0, evictions=0, currsize=1, maxsize=64)
+
+"""
+
+import collections
+import os
+import threading
+
+import formats
+import logjuggler
+
+
+CacheInfo = collections.namedtuple(
+    "CacheInfo", "hits misses updates evictions currsize maxsize")
+
+# bytes at both ends of a scanned range compared to detect rewrites
+FINGERPRINT_SIZE = 64
+
+
+def file_identity(file):
+    """Return (identity, size) of the given file.
+
+    Raises:
+        OSError if the file can not be found.
+
+    """
+    stat = os.stat(file)
+    return (os.path.abspath(file), stat.st_dev, stat.st_ino), stat.st_size
+
+
+def fingerprint(file, start, offset):
+    """Return (head, tail) bytes of the scanned range [start, offset) of the file.
+
+    A file truncated and rewritten in place (eg logrotate copytruncate)
+    keeps its inode and may grow past offset again, but the bytes at both
+    ends of the range change.
+
+    """
+    with open(file, 'rb') as f:
+        f.seek(start)
+        head = f.read(min(FINGERPRINT_SIZE, offset - start))
+        f.seek(max(start, offset - FINGERPRINT_SIZE))
+        tail = f.read(offset - max(start, offset - FINGERPRINT_SIZE))
+    return head, tail
+
+
+def read_lines(file, start, end, include_partial=False):
+    """Return (lines, offset) with complete lines between byte offsets.
+
+    A trailing line without a newline may still be written to, so it is
+    left out and offset points at its beginning.
+
+    Args:
+        file: str, location of the log file
+        start: int, offset of the first byte
+        end: int, offset after the last byte
+        include_partial: bool, include the trailing line without a newline,
+                         for files that are not written to any more
+
+    """
+    lines = []
+    offset = start
+    with open(file, 'rb') as f:
+        f.seek(start)
+        for line in f:
+            if offset + len(line) > end:
+                break
+            if not include_partial and not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            if not isinstance(line, str):
+                line = line.decode('utf-8')
+            lines.append(line.rstrip('\r\n'))
+    return lines, offset
+
+
+class _Entry(object):
+
+    """Cached results of a single query."""
+
+    __slots__ = ('offset', 'results', 'fingerprint', 'stop', 'partial', 'used')
+
+    def __init__(self, offset, results, fingerprint):
+        self.offset = offset
+        self.results = results
+        self.fingerprint = fingerprint
+        # how far the file was read and results of the trailing line
+        # without a newline in [offset, stop)
+        self.stop = None
+        self.partial = []
+        self.used = 0
+
+
+class QueryCache(object):
+
+    """LRU cache of search results.
+
+    Args:
+        maxsize: int, max number of cached queries
+        max_items: int or None, max number of cached logs in all queries
+        log_format: see logjuggler.parse_log_lines
+
+    """
+
+    def __init__(self, maxsize=128, max_items=None, log_format=None):
+        self.maxsize = maxsize
+        self.max_items = max_items
+        self.log_format = log_format
+        self._entries = {}
+        self._items = 0
+        self._used = 0
+        self._formats = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.updates = self.evictions = 0
+
+    def cache_info(self):
+        """Return CacheInfo namedtuple with cache statistics."""
+        return CacheInfo(self.hits, self.misses, self.updates, self.evictions,
+                         len(self._entries), self.maxsize)
+
+    def cache_clear(self):
+        """Drop all cached results and reset statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._formats.clear()
+            self._items = 0
+            self.hits = self.misses = self.updates = self.evictions = 0
+
+    def invalidate(self, file):
+        """Drop cached results for the given file (str)."""
+        path = os.path.abspath(file)
+        with self._lock:
+            for key in [key for key in self._entries if key[0][0] == path]:
+                self._items -= len(self._entries.pop(key).results)
+            for identity in [i for i in self._formats if i[0] == path]:
+                del self._formats[identity]
+
+    def search(self, file, query, start=0, end=None):
+        """Return a list with search results.
+
+        Args:
+            file: str, location of the log file
+            query: tuple from logjuggler.make_query
+            start: int, byte offset where the search starts
+            end: int or None, byte offset where the search ends,
+                 None searches to the end of the file
+
+        Data appended since the last search is scanned and merged into
+        the cached results, up to end if given.
+
+        """
+        identity, size = file_identity(file)
+        key = (identity, start, end, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.offset > size or
+                                      entry.fingerprint != fingerprint(file, start, entry.offset)):
+                # truncated or rewritten in place, cached results are stale
+                self._items -= len(self._entries.pop(key).results)
+                entry = None
+
+            stop = size if end is None else min(end, size)
+            if entry is None:
+                self.misses += 1
+                results, offset = self._scan(file, identity, query, start, stop)
+                entry = _Entry(offset, results, fingerprint(file, start, offset))
+                self._items += len(results)
+            elif entry.offset < stop and entry.stop != stop:
+                results, offset = self._scan(file, identity, query, entry.offset, stop)
+                if offset > entry.offset:
+                    self.updates += 1
+                    entry.offset = offset
+                    entry.fingerprint = fingerprint(file, start, offset)
+                    entry.results.extend(results)
+                    self._items += len(results)
+                else:
+                    # only the trailing line changed, no new complete data
+                    self.hits += 1
+            else:
+                self.hits += 1
+
+            if entry.stop != stop:
+                entry.partial = []
+                if entry.offset < stop:
+                    entry.partial = self._scan(file, identity, query, entry.offset, stop,
+                                               include_partial=True)[0]
+                entry.stop = stop
+
+            self._used += 1
+            entry.used = self._used
+            self._entries[key] = entry
+            self._evict()
+            return entry.results + entry.partial
+
+    def _scan(self, file, identity, query, start, end, include_partial=False):
+        lines, offset = read_lines(file, start, end, include_partial)
+        log_format = self.log_format or self._formats.get(identity)
+        if log_format is None:
+            log_format = formats.detect_format(lines[:formats.SAMPLE_SIZE])
+            if log_format is not None:
+                self._formats[identity] = log_format
+            elif lines:
+                raise ValueError("Unable to detect log format of {file}".format(file=file))
+            else:
+                return [], offset
+        logs = logjuggler.parse_log_lines(lines, log_format)
+        return list(logjuggler.search_results(logjuggler.query_filter(query), logs)), offset
+
+    def _full(self):
+        return (len(self._entries) > self.maxsize or
+                (self.max_items is not None and self._items > self.max_items))
+
+    def _evict(self):
+        if not self._full():
+            return
+        # least recently used first
+        for key in sorted(self._entries, key=lambda key: self._entries[key].used):
+            self._items -= len(self._entries.pop(key).results)
+            self.evictions += 1
+            if not self._full():
+                break
+
+    def get_log_level(self, log_level, file):
+        """Return a list with log level search results."""
+        return self.search(file, logjuggler.make_query('loglevel', log_level))
+
+    def get_sid(self, sid, file):
+        """Return a list with session id search results."""
+        return self.search(file, logjuggler.make_query('sid', sid))
+
+    def get_bid(self, bid, file):
+        """Return a list with business id search results."""
+        return self.search(file, logjuggler.make_query('bid', bid))
+
+    def get_rid(self, rid, file):
+        """Return a list with request id search results."""
+        return self.search(file, logjuggler.make_query('rid', rid))
+
+    def get_dates(self, start_date, end_date, file):
+        """Return a list with date range search results."""
+        return self.search(file, logjuggler.make_query('date', start_date, end_date))
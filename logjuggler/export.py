@@ -0,0 +1,223 @@
+"""
+
+Columnar export of search results.
+
+Log lines are parsed into plain tuples, filtered and gathered into
+batches of rows which are transposed into columns and handed to a
+writer, so memory use is bounded by the batch size however big the log
+is. Arrow IPC and Parquet files need pyarrow, which is imported only
+when one of them is written; CSV is always available.
+
+Usage:
+    >>> import export, logjuggler
+    >>> query = logjuggler.make_query('loglevel', 'ERROR')
+    >>> export.export_log_file('../data/app.log', 'errors.parquet', query=query)
+    1
+
+The same from the command line:
+
+    $ logjuggler -f data/app.log export errors.parquet --query loglevel ERROR
+
+"""
+
+import io
+import os
+
+import formats
+import logjuggler
+
+
+COLUMNS = logjuggler.Log._fields
+
+BATCH_SIZE = 65536
+
+# file extension -> export format
+EXTENSIONS = {
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+    '.parquet': 'parquet',
+    '.csv': 'csv',
+}
+
+
+def row_filter(query):
+    """Return a func that filters parsed rows (tuples in Log field order).
+
+    Args:
+        query: tuple from logjuggler.make_query or None to keep all rows
+
+    """
+    if query is None:
+        return lambda row: True
+    name = query[0]
+    if name == 'date':
+        start, end = query[1], query[2]
+        return lambda row: start <= row[0] <= end
+    field = logjuggler.QUERY_FIELDS[name]
+    value = formats.intern(query[1])
+    return lambda row: row[field] == value
+
+
+def scan_batches(lines, query=None, log_format=None, batch_size=BATCH_SIZE):
+    """Return a generator that yields batches of columns.
+
+    Args:
+        lines: iterable of log lines (str)
+        query: tuple from logjuggler.make_query or None to keep all rows
+        log_format: see logjuggler.resolve_log_format
+        batch_size: int, max number of rows in a batch
+
+    Yields:
+        list of columns (tuples) in COLUMNS order, dates are datetime objects
+
+    Raises:
+        ValueError if batch_size is smaller than 1 or the log format can
+        not be detected, when called rather than on the first batch.
+
+    """
+    if batch_size < 1:
+        raise ValueError("Batch size must be positive, got {0}".format(batch_size))
+    log_format, lines = logjuggler.resolve_log_format(lines, log_format)
+    if log_format is None:
+        return iter(())
+    return _scan_batches(lines, query, log_format, batch_size)
+
+
+def _scan_batches(lines, query, log_format, batch_size):
+    extract = log_format.extractor()
+    keep = row_filter(query)
+
+    rows = []
+    for line in lines:
+        row = extract(line)
+        if row is not None and keep(row):
+            rows.append(row)
+            if len(rows) == batch_size:
+                yield list(zip(*rows))
+                rows = []
+    if rows:
+        yield list(zip(*rows))
+
+
+class CsvWriter(object):
+
+    """CSV writer with a header row, dates in ISO format."""
+
+    def __init__(self, path):
+        import csv
+
+        if str is bytes:
+            self.file = open(path, 'wb')
+        else:
+            self.file = io.open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write_batch(self, columns):
+        dates = [logjuggler.time_to_iso(date) for date in columns[0]]
+        self.writer.writerows(zip(dates, *columns[1:]))
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowWriter(object):
+
+    """Arrow IPC file or Parquet writer, requires pyarrow."""
+
+    def __init__(self, path, parquet=False):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError("pyarrow is required to export Arrow and Parquet files, "
+                              "use a .csv output instead")
+        self.pa = pyarrow
+        self.schema = pyarrow.schema(
+            [pyarrow.field('date', pyarrow.timestamp('us'))] +
+            [pyarrow.field(name, pyarrow.string()) for name in COLUMNS[1:]])
+        if parquet:
+            import pyarrow.parquet
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        else:
+            self.writer = pyarrow.RecordBatchFileWriter(path, self.schema)
+        self.parquet = parquet
+
+    def write_batch(self, columns):
+        arrays = [self.pa.array(column, type=field.type)
+                  for column, field in zip(columns, self.schema)]
+        batch = self.pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if self.parquet:
+            self.writer.write_table(self.pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+
+    def close(self):
+        self.writer.close()
+
+
+def open_writer(path, to='auto'):
+    """Return a writer for the given path (str) and format.
+
+    Args:
+        to: str, one of 'arrow', 'parquet', 'csv' or 'auto' to choose
+            by file extension
+
+    Raises:
+        ValueError if the format can not be chosen.
+        ImportError if pyarrow is needed and missing.
+
+    """
+    if to == 'auto':
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in EXTENSIONS:
+            raise ValueError("Unknown export format for {path}, use one of: {0}".format(
+                ', '.join(sorted(EXTENSIONS)), path=path))
+        to = EXTENSIONS[extension]
+    if to == 'csv':
+        return CsvWriter(path)
+    if to in ('arrow', 'parquet'):
+        return ArrowWriter(path, parquet=(to == 'parquet'))
+    raise ValueError("Unknown export format: {to}".format(to=to))
+
+
+def export_lines(lines, path, to='auto', query=None, log_format=None, batch_size=BATCH_SIZE):
+    """Write logs matching the query to a columnar file.
+
+    Args:
+        lines: iterable of log lines (str)
+        path: str, location of the output file
+        to: see open_writer
+        query: tuple from logjuggler.make_query or None to export all logs
+        log_format: see logjuggler.resolve_log_format
+        batch_size: int, number of rows written at once
+
+    Returns:
+        int, number of exported logs
+
+    """
+    # resolves the log format, so bad input fails before the output is created
+    batches = scan_batches(lines, query, log_format, batch_size)
+    writer = open_writer(path, to)
+    exported = 0
+    try:
+        for columns in batches:
+            writer.write_batch(columns)
+            exported += len(columns[0])
+    finally:
+        writer.close()
+    return exported
+
+
+def export_log_file(file, path, to='auto', query=None, log_format=None, batch_size=BATCH_SIZE):
+    """Write logs from the log file matching the query to a columnar file.
+
+    See export_lines.
+
+    Raises:
+        IOError if the log file can not be opened, before the output is created.
+
+    """
+    with open(file, 'r') as f:
+        return export_lines((line.rstrip('\r\n') for line in f), path, to, query,
+                            log_format, batch_size)
@@ -0,0 +1,222 @@
+"""
+
+Declarative log line formats.
+
+A format is described with a pattern made of literal text and
+``{field}`` placeholders, eg:
+
+    {date} {time} {level} SID:{sid} BID:{bid} RID:{rid} '{message}'
+
+Every pattern is compiled once into a regular expression and a
+specialized extractor that turns a log line into a tuple with the
+``Log`` fields: (date, level, session_id, business_id, request_id,
+message). Placeholders unknown to ``Log`` (eg ``{tid}``) are matched
+but dropped from the result.
+
+Usage:
+    >>> import formats
+    >>> fmt = formats.get_format('default')
+    >>> extract = fmt.extractor()
+    >>> extract("2012-09-13 16:04:22 DEBUG SID:34523 BID:1329 RID:65d33 'Starting new session'")
+    (datetime.datetime(2012, 9, 13, 16, 4, 22), 'DEBUG', '34523', '1329', '65d33', 'Starting new session')
+
+"""
+
+import datetime
+import re
+
+try:
+    intern = intern
+except NameError:
+    # Python 3
+    from sys import intern
+
+
+# number of lines used to detect the format of a log file
+SAMPLE_SIZE = 5
+
+# regular expressions for known placeholders, anything else matches \S+
+FIELD_PATTERNS = {
+    'date': r'\d{4}-\d{2}-\d{2}',
+    'time': r'\d{2}:\d{2}:\d{2}(?:[.,]\d{1,6})?',
+    'timestamp': r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d{1,6})?',
+    'level': r'[A-Za-z]+',
+    'message': r'.*',
+}
+DEFAULT_FIELD_PATTERN = r'\S+'
+
+# placeholder names mapped to Log fields, in Log order
+LOG_FIELDS = ('level', 'sid', 'bid', 'rid', 'message')
+
+PLACEHOLDER = re.compile(r'{(\w+)}')
+
+_FORMATS = []
+
+
+def to_datetime(date, time):
+    """Return a datetime object from date (YYYY-MM-DD) and time (HH:MM:SS[.ffffff]) strings.
+
+    Slicing fixed offsets is several times faster than strptime.
+
+    """
+    microsecond = 0
+    if len(time) > 8:
+        microsecond = int(time[9:15].ljust(6, '0'))
+    return datetime.datetime(int(date[0:4]), int(date[5:7]), int(date[8:10]),
+                             int(time[0:2]), int(time[3:5]), int(time[6:8]),
+                             microsecond)
+
+
+class LogFormat(object):
+
+    """Compiled log line format."""
+
+    def __init__(self, name, pattern):
+        self.name = name
+        self.pattern = pattern
+        self.fields = PLACEHOLDER.findall(pattern)
+        if len(set(self.fields)) != len(self.fields):
+            raise ValueError("Duplicated placeholder in format {name}: {pattern}".format(
+                name=name, pattern=pattern))
+        if 'timestamp' not in self.fields and not ('date' in self.fields and 'time' in self.fields):
+            raise ValueError("Format {name} needs {{timestamp}} or {{date}} and {{time}}".format(
+                name=name))
+        self.regex = re.compile(self._to_regex(pattern))
+
+    def __repr__(self):
+        return "LogFormat({name!r}, {pattern!r})".format(name=self.name, pattern=self.pattern)
+
+    @staticmethod
+    def _to_regex(pattern):
+        parts = []
+        position = 0
+        for match in PLACEHOLDER.finditer(pattern):
+            parts.append(re.escape(pattern[position:match.start()]))
+            parts.append('(' + FIELD_PATTERNS.get(match.group(1), DEFAULT_FIELD_PATTERN) + ')')
+            position = match.end()
+        parts.append(re.escape(pattern[position:]))
+        return ''.join(parts) + '$'
+
+    def match(self, line):
+        """Return True if the given line (str) matches the format."""
+        return self.regex.match(line) is not None
+
+    def extractor(self, record=tuple, intern_fields=True):
+        """Return a func that parses a log line (str).
+
+        Args:
+            record: callable that receives the Log fields (eg Log._make),
+                    defaults to tuple
+            intern_fields: bool, intern level and ids, so records share
+                           one str object per distinct value and filters
+                           comparing them hit the identity fast path
+
+        Returns:
+            func returning a record or None if the line does not match
+
+        """
+        match = self.regex.match
+        index = dict((field, i) for i, field in enumerate(self.fields))
+        level, sid, bid, rid, message = [index.get(field) for field in LOG_FIELDS]
+
+        if 'timestamp' in index:
+            ts = index['timestamp']
+
+            def stamp_of(groups):
+                return groups[ts]
+        else:
+            date, time = index['date'], index['time']
+
+            def stamp_of(groups):
+                return groups[date] + ' ' + groups[time]
+
+        # timestamps repeat on consecutive lines, so remember the last one
+        last = ['', None]
+        share = intern if intern_fields else (lambda value: value)
+
+        def extract(line):
+            found = match(line)
+            if found is None:
+                return None
+            groups = found.groups()
+            stamp = stamp_of(groups)
+            if stamp != last[0]:
+                last[0] = stamp
+                last[1] = to_datetime(stamp[:10], stamp[11:])
+            return record((
+                last[1],
+                share(groups[level]) if level is not None else None,
+                share(groups[sid]) if sid is not None else None,
+                share(groups[bid]) if bid is not None else None,
+                share(groups[rid]) if rid is not None else None,
+                groups[message] if message is not None else None,
+            ))
+        return extract
+
+
+def register_format(name, pattern):
+    """Compile and register a log format.
+
+    Formats registered later take part in detection after the existing ones.
+    Registering an existing name replaces that format.
+
+    Args:
+        name: str
+        pattern: str, eg "{date} {time} {level} SID:{sid} '{message}'"
+
+    Returns:
+        LogFormat obj
+
+    Raises:
+        ValueError if the pattern is invalid.
+
+    """
+    log_format = LogFormat(name, pattern)
+    for i, registered in enumerate(_FORMATS):
+        if registered.name == name:
+            _FORMATS[i] = log_format
+            break
+    else:
+        _FORMATS.append(log_format)
+    return log_format
+
+
+def get_format(name):
+    """Return registered LogFormat with the given name.
+
+    Raises:
+        KeyError if there is no such format.
+
+    """
+    for log_format in _FORMATS:
+        if log_format.name == name:
+            return log_format
+    raise KeyError("Unknown log format: {name}".format(name=name))
+
+
+def available_formats():
+    """Return a list with names of registered formats."""
+    return [log_format.name for log_format in _FORMATS]
+
+
+def detect_format(lines):
+    """Return the LogFormat matching most of the given lines.
+
+    Args:
+        lines: list of log lines (str), eg first SAMPLE_SIZE lines of a file
+
+    Returns:
+        LogFormat obj or None if no format matches any line
+
+    """
+    best, best_score = None, 0
+    for log_format in _FORMATS:
+        score = sum(1 for line in lines if log_format.match(line))
+        if score > best_score:
+            best, best_score = log_format, score
+    return best
+
+
+register_format('default', "{date} {time} {level} SID:{sid} BID:{bid} RID:{rid} '{message}'")
+register_format('tid', "{date} {time} {level} SID:{sid} BID:{bid} RID:{rid} TID:{tid} '{message}'")
+register_format('iso8601', "{timestamp} {level} SID:{sid} BID:{bid} RID:{rid} '{message}'")
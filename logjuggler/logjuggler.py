@@ -9,18 +9,22 @@ Usage:
 ------
 
     (venvweb)jakub@urababura:~/projects/logjuggler/logjuggler$ python logjuggler.py --file ../data/app.log --help
-    usage: logjuggler.py [-h] -f LOGFILE {loglevel,bid,sid,rid,date} ...
+    usage: logjuggler.py [-h] -f LOGFILE [--format {default,tid,iso8601}]
+                         {loglevel,bid,sid,rid,date,batch,alert,export} ...
 
     A simple log file parser.
 
     positional arguments:
-        {loglevel,bid,sid,rid,date}
+        {loglevel,bid,sid,rid,date,batch,alert,export}
                               Log filters
 
     optional arguments:
         -h, --help            show this help message and exit
         -f LOGFILE, --file LOGFILE
                               Log file to parse
+        --format {default,tid,iso8601}
+                              Log format, detected from the first lines by
+                              default
 
 
 
@@ -64,12 +68,27 @@ Usage:
     2012-09-13 16:04:22 DEBUG sid:34523 bid:1329 rid:65d33 message:Starting new session
 
 
+
+    Many queries over a single parse of the log (queries file or stdin),
+    the same is available as `python -m logjuggler` and, after `pip install .`,
+    as the `logjuggler` command:
+
+    (venvweb)jakub@urababura:~/projects/logjuggler$ printf "rid 65d33\\nloglevel WARN\\n" | logjuggler --file data/app.log batch
+    # rid 65d33
+    2012-09-13 16:04:22 DEBUG sid:34523 bid:1329 rid:65d33 message:Starting new session
+    # loglevel WARN
+    2012-09-13 16:05:32 WARN sid:42111 bid:319 rid:7a323 message:Invalid asset ID
+
+
 """
 
 
 import collections
 import datetime
-import argparse
+import itertools
+import sys
+
+import formats
 
 
 # namedtuple - storing data from a sinle log line
@@ -89,11 +108,75 @@ def read_log_file(file):
     try:
         with open(file, 'r') as f:
             for line in f:
-                yield line.strip("\n")
+                yield line.rstrip("\r\n")
     except IOError:
         print("Log file {file_name} can not be found".format(file_name=file))
 
 
+def resolve_log_format(lines, log_format=None):
+    """Return (LogFormat obj, lines iterator) for the given lines.
+
+    Args:
+        lines: iterable of log lines (str)
+        log_format: formats.LogFormat obj, name of a registered format (str)
+                    or None to detect the format from the first lines
+
+    Returns:
+        LogFormat is None if there are no lines to detect the format from.
+
+    Raises:
+        ValueError if the log format can not be detected.
+
+    """
+    lines = iter(lines)
+    if log_format is None:
+        head = list(itertools.islice(lines, formats.SAMPLE_SIZE))
+        if not head:
+            return None, lines
+        log_format = formats.detect_format(head)
+        if log_format is None:
+            raise ValueError("Unable to detect log format")
+        lines = itertools.chain(head, lines)
+    elif isinstance(log_format, str):
+        log_format = formats.get_format(log_format)
+    return log_format, lines
+
+
+def parse_log_lines(lines, log_format=None):
+    """Return a generator that yields Log objects parsed from lines.
+
+    Args:
+        lines: iterable of log lines (str)
+        log_format: see resolve_log_format
+
+    Raises:
+        ValueError if the log format can not be detected.
+
+    Lines not matching the format are skipped.
+
+    """
+    log_format, lines = resolve_log_format(lines, log_format)
+    if log_format is None:
+        return
+
+    extract = log_format.extractor(Log._make)
+    for line in lines:
+        log = extract(line)
+        if log is not None:
+            yield log
+
+
+def parse_log_file(file, log_format=None):
+    """Return a generator that yields Log objects from the log file.
+
+    Args:
+        file: str, location of the log file
+        log_format: see parse_log_lines
+
+    """
+    return parse_log_lines(read_log_file(file), log_format)
+
+
 def log_message(logline):
     """Return log message (str) from the given logline (str)"""
     return logline[(logline.find("'") + 1): logline.rfind("'")]
@@ -182,8 +265,11 @@ def log_level_filter(loglevel):
         loglevel: str
 
     """
+    # parsed levels and ids are interned, so == stops at the identity check
+    loglevel = formats.intern(str(loglevel).upper())
+
     def inner(log_line):
-        if log_line.level == str(loglevel).upper():
+        if log_line.level == loglevel:
             return log_line
     return inner
 
@@ -195,8 +281,10 @@ def session_id_filter(sid):
         sid: str
 
     """
+    sid = formats.intern(str(sid))
+
     def inner(log_line):
-        if log_line.session_id == str(sid):
+        if log_line.session_id == sid:
             return log_line
     return inner
 
@@ -207,8 +295,10 @@ def business_id_filter(bid):
     Args:
         bid: str
     """
+    bid = formats.intern(str(bid))
+
     def inner(log_line):
-        if log_line.business_id == str(bid):
+        if log_line.business_id == bid:
             return log_line
     return inner
 
@@ -220,8 +310,10 @@ def request_id_filter(rid):
         rid: str
 
     """
+    rid = formats.intern(str(rid))
+
     def inner(log_line):
-        if log_line.request_id == str(rid):
+        if log_line.request_id == rid:
             return log_line
     return inner
 
@@ -248,6 +340,55 @@ def date_range_filter(start_date, end_date):
     return inner
 
 
+# query name -> filter factory, queries are tuples: (name, arg, ...)
+QUERY_FILTERS = {
+    'loglevel': log_level_filter,
+    'sid': session_id_filter,
+    'bid': business_id_filter,
+    'rid': request_id_filter,
+    'date': date_range_filter,
+}
+
+# query name -> position of the compared field in a Log, for queries on a single field
+QUERY_FIELDS = {'loglevel': 1, 'sid': 2, 'bid': 3, 'rid': 4}
+
+
+def make_query(name, *args):
+    """Return a normalized query (tuple) usable as a dict key.
+
+    Equivalent queries are normalized to equal tuples, eg
+    make_query('loglevel', 'error') == make_query('loglevel', 'ERROR').
+
+    Args:
+        name: str, one of QUERY_FILTERS keys
+        args: filter arguments
+
+    Raises:
+        ValueError if the query is unknown or has wrong arguments.
+
+    """
+    if name not in QUERY_FILTERS:
+        raise ValueError("Unknown query: {name}".format(name=name))
+    expected = 2 if name == 'date' else 1
+    if len(args) != expected:
+        raise ValueError("Query {name} expects {expected} argument(s), got {got}".format(
+            name=name, expected=expected, got=len(args)))
+    if name == 'loglevel':
+        return (name, str(args[0]).upper())
+    if name == 'date':
+        dates = tuple(time_str_to_datetime(arg) if isinstance(arg, str) else arg
+                      for arg in args)
+        if None in dates:
+            raise ValueError("Malformed date in query: {args}".format(args=args))
+        return (name,) + dates
+    return (name, str(args[0]))
+
+
+def query_filter(query):
+    """Return a filter func for the given query (tuple from make_query)."""
+    return QUERY_FILTERS[query[0]](*query[1:])
+
+
 def display_log(log):
     """Print a log line based on defined template.
 
@@ -297,15 +438,35 @@ def get_rid(rid, log_entries):
 def get_dates(start_date, end_date, log_entries):
     """Return a list with date range seach results."""
     return [res for res in (search_results(date_range_filter(
-        start_date=arg_dict.get('start'), end_date=arg_dict.get('end')), log_entries))
+        start_date=start_date, end_date=end_date), log_entries))
     ]
 
 
-if __name__ == "__main__":
+# subcommand -> names of arguments passed to make_query
+QUERY_ARGS = {
+    'loglevel': ('loglevel',),
+    'bid': ('bid',),
+    'sid': ('sid',),
+    'rid': ('rid',),
+    'date': ('start', 'end'),
+}
+
+
+def build_parser():
+    """Return command line parser.
+
+    argparse is imported here, it is one of the slowest imports
+    and the module is also used as a library.
+
+    """
+    import argparse
 
     parser = argparse.ArgumentParser(description="A simple log file parser.")
     parser.add_argument('-f', '--file', dest='logfile', action='store',
                         help='Log file to parse', required=True)
+    parser.add_argument('--format', dest='logformat', action='store',
+                        choices=formats.available_formats(), default=None,
+                        help='Log format, detected from the first lines by default')
 
     subparsers = parser.add_subparsers(help='Log filters')
 
@@ -313,44 +474,175 @@ if __name__ == "__main__":
     log_level_parser.add_argument('loglevel', action='store',
                                   choices=('DEBUG', 'INFO', 'WARN', 'ERROR'),
                                   help="Show logs with given loglevel.")
+    log_level_parser.set_defaults(command='loglevel')
 
     business_id_parser = subparsers.add_parser('bid')
     business_id_parser.add_argument('bid', action='store',
                                     help='Show logs with given business id')
+    business_id_parser.set_defaults(command='bid')
 
     session_id_parser = subparsers.add_parser('sid')
     session_id_parser.add_argument('sid', action='store',
                                    help='Show logs with session id')
+    session_id_parser.set_defaults(command='sid')
 
     request_id_parser = subparsers.add_parser('rid')
     request_id_parser.add_argument('rid', action='store',
                                    help='Show logs with request id.')
+    request_id_parser.set_defaults(command='rid')
 
     date_parser = subparsers.add_parser('date')
     date_parser.add_argument('start', action='store', help='Start date.')
     date_parser.add_argument('end', action='store', help='End date.')
+    date_parser.set_defaults(command='date')
+
+    batch_parser = subparsers.add_parser('batch')
+    batch_parser.add_argument('queries', action='store', nargs='?', default='-',
+                              help='File with one query per line, eg "sid 34523" '
+                                   '(default: stdin).')
+    batch_parser.set_defaults(command='batch')
+
+    alert_parser = subparsers.add_parser('alert')
+    alert_parser.add_argument('--levels', nargs='+', default=['ERROR', 'WARN'],
+                              choices=('DEBUG', 'INFO', 'WARN', 'ERROR'),
+                              help='Watched log levels (default: ERROR WARN).')
+    alert_parser.add_argument('--window', type=int, default=60,
+                              help='Window length in seconds (default: 60).')
+    alert_parser.add_argument('--threshold', type=int, default=None,
+                              help='Alert when a window holds that many logs.')
+    alert_parser.add_argument('--rate', type=float, default=None,
+                              help='Alert when a window holds that many times '
+                                   'more logs than the previous one.')
+    alert_parser.add_argument('--min-count', dest='min_count', type=int, default=5,
+                              help='Smallest window firing the rate rule (default: 5).')
+    alert_parser.add_argument('--max-keys', dest='max_keys', type=int, default=10000,
+                              help='Max number of tracked business ids and levels.')
+    alert_parser.add_argument('--follow', action='store_true',
+                              help='Keep reading lines appended to the log file, '
+                                   'requires --format.')
+    alert_parser.set_defaults(command='alert')
+
+    export_parser = subparsers.add_parser('export')
+    export_parser.add_argument('output', action='store',
+                               help='Output file, eg errors.parquet, errors.arrow or errors.csv')
+    export_parser.add_argument('--to', default='auto',
+                               choices=('auto', 'arrow', 'parquet', 'csv'),
+                               help='Output format (default: by output file extension).')
+    export_parser.add_argument('--query', nargs='+', default=None,
+                               help='Export only matching logs, eg: --query sid 34523')
+    export_parser.add_argument('--batch-size', dest='batch_size', type=int, default=65536,
+                               help='Number of rows written at once (default: 65536).')
+    export_parser.set_defaults(command='export')
+
+    return parser
+
+
+def run_batch(query_lines, log_entries):
+    """Answer many queries over a single parse of the log.
+
+    Every query line (eg "loglevel ERROR" or "date '2012-09-13 16:00:00'
+    '2012-09-13 17:00:00'") is echoed as a "# query" header followed by
+    its search results. Empty lines and lines starting with # are skipped.
 
-    arg_dict = vars(parser.parse_args())
+    Args:
+        query_lines: iterable of str
+        log_entries: iterable of Log objects
 
-    log_entries = (Log(log_time(l), log_level(l), session_id(l), business_id(l),
-                       request_id(l), log_message(l)) for l in read_log_file(arg_dict.get('logfile')))
+    Returns:
+        int, number of malformed queries
 
-    if arg_dict.get('loglevel'):
-        result = get_log_level(arg_dict.get('loglevel'), log_entries)
-        display_search_results(result)
+    """
+    import shlex
+
+    logs = list(log_entries)
+    errors = 0
+    for line in query_lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        print("# " + line)
+        try:
+            query = make_query(*shlex.split(line))
+        except ValueError as e:
+            print("Malformed query: {0}".format(e))
+            errors += 1
+            continue
+        display_search_results(search_results(query_filter(query), logs))
+    return errors
+
+
+def run_alerts(arg_dict):
+    """Write alerts for the log file as JSON lines, returns exit status (int)."""
+    import alerts
+
+    rules = []
+    if arg_dict.get('threshold') is not None:
+        rules.append(alerts.ThresholdRule(arg_dict.get('threshold')))
+    if arg_dict.get('rate') is not None:
+        rules.append(alerts.RateRule(arg_dict.get('rate'), arg_dict.get('min_count')))
+    if not rules:
+        print("alert needs --threshold and/or --rate")
+        return 1
+    # detection waits for the first lines, which may never come to a quiet log
+    if arg_dict.get('follow') and arg_dict.get('logformat') is None:
+        print("alert --follow needs --format")
+        return 1
+
+    detector = alerts.AlertDetector(rules, arg_dict.get('levels'), arg_dict.get('window'),
+                                    max_keys=arg_dict.get('max_keys'))
+    if arg_dict.get('follow'):
+        lines = alerts.follow_log_file(arg_dict.get('logfile'))
+    else:
+        lines = read_log_file(arg_dict.get('logfile'))
+    try:
+        alerts.write_alerts(detector.run(parse_log_lines(lines, arg_dict.get('logformat'))),
+                            sys.stdout)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv=None):
+    """Command line entry point, returns exit status (int)."""
+    arg_dict = vars(build_parser().parse_args(argv))
+    command = arg_dict.get('command')
+
+    if command == 'alert':
+        try:
+            return run_alerts(arg_dict)
+        except (IOError, ValueError) as e:
+            print(e)
+            return 1
+
+    if command == 'export':
+        import export
+
+        try:
+            query = make_query(*arg_dict.get('query')) if arg_dict.get('query') else None
+            export.export_log_file(arg_dict.get('logfile'), arg_dict.get('output'),
+                                   arg_dict.get('to'), query, arg_dict.get('logformat'),
+                                   arg_dict.get('batch_size'))
+        except (IOError, ImportError, ValueError) as e:
+            print(e)
+            return 1
+        return 0
+
+    log_entries = parse_log_file(arg_dict.get('logfile'), arg_dict.get('logformat'))
 
-    if arg_dict.get('bid'):
-        result = get_bid(arg_dict.get('bid'), log_entries)
-        display_search_results(result)
+    try:
+        if command == 'batch':
+            if arg_dict.get('queries') == '-':
+                return 1 if run_batch(sys.stdin, log_entries) else 0
+            with open(arg_dict.get('queries')) as f:
+                return 1 if run_batch(f, log_entries) else 0
 
-    if arg_dict.get('sid'):
-        result = get_sid(arg_dict.get('sid'), log_entries)
-        display_search_results(result)
+        query = make_query(command, *[arg_dict.get(name) for name in QUERY_ARGS[command]])
+        display_search_results(search_results(query_filter(query), log_entries))
+    except (IOError, ValueError) as e:
+        print(e)
+        return 1
+    return 0
 
-    if arg_dict.get('rid'):
-        result = get_rid(arg_dict.get('rid'), log_entries)
-        display_search_results(result)
 
-    if arg_dict.get('start') and arg_dict.get('end'):
-        result = get_dates(arg_dict.get('start'), arg_dict.get('end'), log_entries)
-        display_search_results(result)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+
+"""
+
+Shardable log index.
+
+A shard indexes a byte range of a log file. It is a self-contained JSON
+document, so shards built on many hosts can be copied to and queried on
+a central one:
+
+    {
+        "version": 1,
+        "sources": [{"host": ..., "source": ..., "start": 0, "end": 1024}],
+        "format": "default",
+        "rows": [[date, level, session_id, business_id, request_id, message], ...],
+        "index": {"loglevel": {"ERROR": [row, ...]}, "sid": {...}, "bid": {...}, "rid": {...}}
+    }
+
+Rows are sorted by timestamp (ISO strings, which sort like datetimes)
+and hold the Log fields, index lists point at rows in the same order.
+Date range queries bisect the rows, other queries read one posting list.
+
+Usage:
+    >>> import shards
+    >>> paths = shards.build_shards(['../data/app.log'], '/tmp/shards', processes=4, parts=4)
+    >>> shards.query_shards(paths, ('loglevel', 'ERROR'), processes=4)
+    [Log(date='2012-09-13 16:04:50', level='ERROR', session_id='34523', business_id='1329', request_id='54ff3', message='Missing Authentication token')]
+
+The same from the command line:
+
+    $ python shards.py build /tmp/shards ../data/app.log --processes 4 --parts 4
+    $ python shards.py query 'loglevel ERROR' /tmp/shards/*.shard.json
+
+"""
+
+import bisect
+import itertools
+import json
+import multiprocessing
+import os
+import socket
+import sys
+
+import cache
+import formats
+import logjuggler
+
+
+SHARD_VERSION = 1
+
+
+def _native(value):
+    """Return str for json strings, which are unicode on Python 2."""
+    if value is None or isinstance(value, str):
+        return value
+    return value.encode('utf-8')
+
+
+def split_ranges(file, parts):
+    """Return a list of (start, end) byte ranges aligned to line boundaries.
+
+    Args:
+        file: str, location of the log file
+        parts: int, max number of ranges
+
+    """
+    size = os.path.getsize(file)
+    offsets = [0]
+    with open(file, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts, offsets[-1]))
+            f.readline()
+            offset = f.tell()
+            if offset >= size:
+                break
+            if offset > offsets[-1]:
+                offsets.append(offset)
+    offsets.append(size)
+    return list(zip(offsets, offsets[1:]))
+
+
+class _Column(object):
+
+    """Read-only view of one field of the rows, for bisect."""
+
+    def __init__(self, rows, field):
+        self.rows = rows
+        self.field = field
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        return self.rows[i][self.field]
+
+
+def _merge_sorted(runs):
+    """Return a list with items of the timestamp sorted runs (lists).
+
+    Timsort merges presorted runs in linear time and, unlike heapq.merge,
+    keeps the run order for equal timestamps.
+
+    """
+    return sorted(itertools.chain(*runs), key=lambda item: item[0])
+
+
+def _index_rows(rows):
+    index = dict((name, {}) for name in logjuggler.QUERY_FIELDS)
+    for i, row in enumerate(rows):
+        for name, field in logjuggler.QUERY_FIELDS.items():
+            if row[field] is not None:
+                index[name].setdefault(row[field], []).append(i)
+    return index
+
+
+def build_shard(source, start=0, end=None, log_format=None):
+    """Return a shard (dict) indexing a byte range of the log file.
+
+    Args:
+        source: str, location of the log file
+        start: int, byte offset where the range starts (beginning of a line)
+        end: int or None, byte offset where the range ends, defaults to file size
+        log_format: see logjuggler.parse_log_lines
+
+    Raises:
+        ValueError if the log format can not be detected.
+
+    """
+    if end is None:
+        end = os.path.getsize(source)
+    lines, end = cache.read_lines(source, start, end, include_partial=True)
+    if log_format is None:
+        log_format = formats.detect_format(lines[:formats.SAMPLE_SIZE])
+        if log_format is None and lines:
+            raise ValueError("Unable to detect log format of {file}".format(file=source))
+    elif isinstance(log_format, str):
+        log_format = formats.get_format(log_format)
+
+    rows = []
+    if lines:
+        for log in logjuggler.parse_log_lines(lines, log_format):
+            rows.append(list(logjuggler.convert_to_timestamp(log)))
+    # sort is stable, logs with the same timestamp keep file order
+    rows.sort(key=lambda row: row[0])
+
+    return {
+        'version': SHARD_VERSION,
+        'sources': [{'host': socket.gethostname(), 'source': os.path.abspath(source),
+                     'start': start, 'end': end}],
+        'format': log_format.name if log_format is not None else None,
+        'rows': rows,
+        'index': _index_rows(rows),
+    }
+
+
+def write_shard(shard, path):
+    """Write shard (dict) to the given path (str)."""
+    with open(path, 'w') as f:
+        json.dump(shard, f, separators=(',', ':'))
+
+
+def load_shard(path):
+    """Return shard (dict) stored in the given path (str).
+
+    Raises:
+        ValueError if the file is not a shard of a supported version.
+
+    """
+    with open(path) as f:
+        shard = json.load(f)
+    if shard.get('version') != SHARD_VERSION:
+        raise ValueError("Unsupported shard version in {path}: {version}".format(
+            path=path, version=shard.get('version')))
+    rows = []
+    for row in shard['rows']:
+        row = [_native(value) for value in row]
+        for field in logjuggler.QUERY_FIELDS.values():
+            if row[field] is not None:
+                row[field] = formats.intern(row[field])
+        rows.append(row)
+    shard['rows'] = rows
+    return shard
+
+
+def merge_shards(shards):
+    """Return a single shard (dict) with rows of all the given shards.
+
+    Raises:
+        ValueError if the shards were built for different log formats.
+
+    """
+    log_formats = set(shard['format'] for shard in shards if shard['rows'])
+    if len(log_formats) > 1:
+        raise ValueError("Can not merge shards of different formats: {0}".format(
+            sorted(log_formats)))
+    rows = _merge_sorted([shard['rows'] for shard in shards])
+    return {
+        'version': SHARD_VERSION,
+        'sources': [source for shard in shards for source in shard['sources']],
+        'format': log_formats.pop() if log_formats else None,
+        'rows': rows,
+        'index': _index_rows(rows),
+    }
+
+
+def query_shard(shard, query):
+    """Return a list with search results sorted by timestamp.
+
+    Args:
+        shard: dict or str, shard or location of a shard file
+        query: tuple from logjuggler.make_query
+
+    """
+    if not isinstance(shard, dict):
+        shard = load_shard(shard)
+    rows = shard['rows']
+    name = query[0]
+    if name == 'date':
+        timestamps = _Column(rows, 0)
+        start = bisect.bisect_left(timestamps, logjuggler.time_to_iso(query[1]), 0, len(rows))
+        end = bisect.bisect_right(timestamps, logjuggler.time_to_iso(query[2]), 0, len(rows))
+        found = rows[start:end]
+    else:
+        found = [rows[i] for i in shard['index'][name].get(query[1], ())]
+    return [logjuggler.Log._make(row) for row in found]
+
+
+def _build_worker(task):
+    source, start, end, log_format, path = task
+    write_shard(build_shard(source, start, end, log_format), path)
+    return path
+
+
+def _query_worker(task):
+    path, query = task
+    return query_shard(path, query)
+
+
+def _map(func, tasks, processes):
+    if processes == 1 or len(tasks) < 2:
+        return [func(task) for task in tasks]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(func, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def build_shards(sources, out_dir, processes=None, parts=1, log_format=None):
+    """Index log files in parallel, one shard file per byte range.
+
+    Args:
+        sources: list of log file locations (str)
+        out_dir: str, directory for shard files, created if missing
+        processes: int or None, number of worker processes (None: cpu count)
+        parts: int, number of byte ranges per log file
+        log_format: name of a registered format (str) or None to detect it
+
+    Returns:
+        list of shard file locations
+
+    """
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    tasks = []
+    for source in sources:
+        for start, end in split_ranges(source, parts):
+            path = os.path.join(out_dir, "{0:04d}-{1}.shard.json".format(
+                len(tasks), os.path.basename(source)))
+            tasks.append((source, start, end, log_format, path))
+    return _map(_build_worker, tasks, processes)
+
+
+def query_shards(paths, query, processes=None):
+    """Fan the query out to shard files and merge results in timestamp order.
+
+    Args:
+        paths: list of shard file locations (str)
+        query: tuple from logjuggler.make_query
+        processes: int or None, number of worker processes (None: cpu count)
+
+    Returns:
+        list of Log objects
+
+    """
+    results = _map(_query_worker, [(path, query) for path in paths], processes)
+    return _merge_sorted(results)
+
+
+def main(argv=None):
+    """Command line entry point, returns exit status (int)."""
+    import argparse
+    import shlex
+
+    parser = argparse.ArgumentParser(description="Build and query log index shards.")
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Number of worker processes (default: cpu count).')
+    subparsers = parser.add_subparsers(help='Shard commands')
+
+    build_parser = subparsers.add_parser('build')
+    build_parser.add_argument('out_dir', help='Directory for shard files.')
+    build_parser.add_argument('sources', nargs='+', help='Log files to index.')
+    build_parser.add_argument('--parts', type=int, default=1,
+                              help='Number of shards per log file.')
+    build_parser.add_argument('--format', dest='logformat', default=None,
+                              choices=formats.available_formats(), help='Log format.')
+    build_parser.add_argument('--processes', type=int, default=argparse.SUPPRESS,
+                              help='Number of worker processes (default: cpu count).')
+    build_parser.set_defaults(command='build')
+
+    query_parser = subparsers.add_parser('query')
+    query_parser.add_argument('query', help='Query, eg "sid 34523".')
+    query_parser.add_argument('shards', nargs='+', help='Shard files.')
+    query_parser.add_argument('--processes', type=int, default=argparse.SUPPRESS,
+                              help='Number of worker processes (default: cpu count).')
+    query_parser.set_defaults(command='query')
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'build':
+            for path in build_shards(args.sources, args.out_dir, args.processes,
+                                     args.parts, args.logformat):
+                print(path)
+        else:
+            query = logjuggler.make_query(*shlex.split(args.query))
+            logjuggler.display_search_results(
+                query_shards(args.shards, query, args.processes))
+    except (IOError, OSError, ValueError) as e:
+        print(e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -27,6 +27,15 @@ setup(
     include_package_data=True,
     install_requires=[
     ],
+    extras_require={
+        'arrow': ['pyarrow'],
+    },
+    entry_points={
+        'console_scripts': [
+            'logjuggler = logjuggler.logjuggler:main',
+            'logjuggler-shards = logjuggler.shards:main',
+        ],
+    },
     license='MIT',
     zip_safe=False,
     keywords='logjuggler',
@@ -0,0 +1,156 @@
+"""
+
+Tests for `alerts` module.
+
+"""
+
+import datetime
+import io
+import json
+import threading
+import time
+import pytest
+from logjuggler import alerts
+from logjuggler import logjuggler
+
+
+START = datetime.datetime(2012, 9, 13, 16, 0, 0)
+
+
+def make_log(seconds, level='ERROR', bid='1329'):
+    return logjuggler.Log(START + datetime.timedelta(seconds=seconds), level,
+                          '34523', bid, '65d33', 'message')
+
+
+class TestSlidingWindowCounter(object):
+    def test_counts_slide_between_windows(self):
+        counter = alerts.SlidingWindowCounter(window=60, buckets=6)
+        for seconds in (0, 5, 30):
+            counter.add(seconds)
+        assert (counter.current, counter.previous) == (3, 0)
+        counter.add(65)
+        assert (counter.current, counter.previous) == (2, 2)
+        counter.add(125)
+        assert (counter.current, counter.previous) == (1, 2)
+        counter.add(185)
+        assert (counter.current, counter.previous) == (1, 1)
+
+    def test_window_is_not_rounded(self):
+        counter = alerts.SlidingWindowCounter(window=10, buckets=6)
+        counter.add(0)
+        counter.add(7)
+        assert (counter.current, counter.previous) == (2, 0)
+        counter.add(10)
+        assert (counter.current, counter.previous) == (2, 1)
+
+    def test_window_buckets(self):
+        assert alerts.window_buckets(60, 6) == 6
+        assert alerts.window_buckets(100, 6) == 5
+        assert alerts.window_buckets(7, 6) == 1
+        assert alerts.window_buckets(3, 6) == 3
+        with pytest.raises(ValueError):
+            alerts.window_buckets(0, 6)
+
+    def test_long_gap_resets_counts(self):
+        counter = alerts.SlidingWindowCounter(window=60, buckets=6)
+        counter.add(0)
+        counter.add(1000)
+        assert (counter.current, counter.previous) == (1, 0)
+
+    def test_out_of_order_events(self):
+        counter = alerts.SlidingWindowCounter(window=60, buckets=6)
+        counter.add(70)
+        counter.add(50)
+        counter.add(0)
+        counter.add(-100)
+        assert (counter.current, counter.previous) == (2, 1)
+
+
+class TestAlertDetector(object):
+    def test_threshold_fires_once(self):
+        detector = alerts.AlertDetector([alerts.ThresholdRule(3)])
+        fired = list(detector.run([make_log(i) for i in range(5)]))
+        assert len(fired) == 1
+        assert fired[0]['rule'] == 'threshold'
+        assert fired[0]['count'] == 3
+        assert fired[0]['time'] == '2012-09-13 16:00:02'
+
+    def test_threshold_rearms(self):
+        detector = alerts.AlertDetector([alerts.ThresholdRule(2)])
+        logs = [make_log(0), make_log(1), make_log(200), make_log(201)]
+        assert len(list(detector.run(logs))) == 2
+
+    def test_rate_rule(self):
+        detector = alerts.AlertDetector([alerts.RateRule(3, min_count=3)])
+        logs = [make_log(0)] + [make_log(60 + i) for i in range(3)]
+        fired = list(detector.run(logs))
+        assert [(a['count'], a['previous']) for a in fired] == [(3, 1)]
+
+    def test_keys_and_levels(self):
+        detector = alerts.AlertDetector([alerts.ThresholdRule(2)], levels=['error'])
+        logs = [make_log(0, bid='1'), make_log(1, bid='2'), make_log(2, level='WARN'),
+                make_log(3, level='WARN'), make_log(4, bid='1')]
+        fired = list(detector.run(logs))
+        assert [(a['business_id'], a['level']) for a in fired] == [('1', 'ERROR')]
+
+    def test_key_eviction(self):
+        detector = alerts.AlertDetector([alerts.ThresholdRule(2)], max_keys=10)
+        for i in range(25):
+            detector.process(make_log(i, bid=str(i)))
+        assert len(detector.keys) <= 10
+        assert detector.evictions == 15
+        assert ('24', 'ERROR') in detector.keys
+
+    def test_write_alerts(self):
+        stream = io.BytesIO() if str is bytes else io.StringIO()
+        alerts.write_alerts([{'rule': 'rate', 'count': 3}], stream)
+        assert json.loads(stream.getvalue()) == {'rule': 'rate', 'count': 3}
+
+
+class TestFollowLogFile(object):
+    def test_follow_appends_and_partial_lines(self, tmpdir):
+        log_file = tmpdir.join('app.log')
+        log_file.write('first\nsec')
+
+        def append():
+            time.sleep(0.05)
+            log_file.write('ond\nthird\n', mode='a')
+        writer = threading.Thread(target=append)
+        writer.start()
+        lines = list(alerts.follow_log_file(str(log_file), poll_interval=0.01,
+                                            idle_timeout=0.3))
+        writer.join()
+        assert lines == ['first', 'second', 'third']
+
+    def test_follow_truncated_file(self, tmpdir):
+        log_file = tmpdir.join('app.log')
+        log_file.write('first line\n')
+        lines = alerts.follow_log_file(str(log_file), poll_interval=0.01, idle_timeout=0.3)
+        assert next(lines) == 'first line'
+        log_file.write('new\n')
+        assert list(lines) == ['new']
+
+
+class TestAlertCommand(object):
+    def test_alert_command(self, tmpdir, capsys):
+        log_file = tmpdir.join('app.log')
+        log_file.write(''.join(
+            "2012-09-13 16:04:{0:02d} ERROR SID:1 BID:1329 RID:a 'boom'\n".format(i)
+            for i in range(5)))
+        assert logjuggler.main(['-f', str(log_file), 'alert', '--threshold', '4']) == 0
+        out, _ = capsys.readouterr()
+        alert = json.loads(out)
+        assert (alert['business_id'], alert['count']) == ('1329', 4)
+
+    def test_alert_command_needs_a_rule(self, tmpdir, capsys):
+        log_file = tmpdir.join('app.log')
+        log_file.write('')
+        assert logjuggler.main(['-f', str(log_file), 'alert']) == 1
+
+    def test_follow_needs_format(self, tmpdir, capsys):
+        log_file = tmpdir.join('app.log')
+        log_file.write('')
+        assert logjuggler.main(['-f', str(log_file), 'alert', '--threshold', '4',
+                                '--follow']) == 1
+        out, _ = capsys.readouterr()
+        assert '--format' in out
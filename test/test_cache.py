@@ -0,0 +1,115 @@
+"""
+
+Tests for `cache` module.
+
+"""
+
+import pytest
+from logjuggler import cache
+
+
+LINES = [
+    "2012-09-13 16:04:22 DEBUG SID:34523 BID:1329 RID:65d33 'Starting new session'",
+    "2012-09-13 16:04:50 ERROR SID:34523 BID:1329 RID:54ff3 'Missing Authentication token'",
+    "2012-09-13 16:05:32 WARN SID:42111 BID:319 RID:7a323 'Invalid asset ID'",
+]
+
+
+@pytest.fixture
+def log_file(tmpdir):
+    log_file = tmpdir.join('app.log')
+    log_file.write('\n'.join(LINES) + '\n')
+    return log_file
+
+
+class TestQueryCache(object):
+    def test_repeated_query_is_a_hit(self, log_file):
+        query_cache = cache.QueryCache()
+        first = query_cache.get_log_level('ERROR', str(log_file))
+        second = query_cache.get_log_level('error', str(log_file))
+        assert first == second
+        assert [log.request_id for log in first] == ['54ff3']
+        info = query_cache.cache_info()
+        assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+    def test_appended_lines_are_merged(self, log_file):
+        query_cache = cache.QueryCache()
+        assert len(query_cache.get_sid('34523', str(log_file))) == 2
+        log_file.write(LINES[0] + '\n', mode='a')
+        assert len(query_cache.get_sid('34523', str(log_file))) == 3
+        assert query_cache.cache_info().updates == 1
+
+    def test_partial_line_is_not_consumed(self, log_file):
+        query_cache = cache.QueryCache()
+        log_file.write(LINES[1][:30], mode='a')
+        assert len(query_cache.get_log_level('ERROR', str(log_file))) == 1
+        log_file.write(LINES[1][30:] + '\n', mode='a')
+        assert len(query_cache.get_log_level('ERROR', str(log_file))) == 2
+
+    def test_last_line_without_newline(self, log_file):
+        query_cache = cache.QueryCache()
+        log_file.write('\n'.join(LINES))
+        for _ in range(3):
+            assert len(query_cache.get_log_level('WARN', str(log_file))) == 1
+        info = query_cache.cache_info()
+        assert (info.hits, info.misses, info.updates) == (2, 1, 0)
+        # the trailing line is scanned again once it is complete
+        log_file.write('\n' + LINES[2] + '\n', mode='a')
+        assert len(query_cache.get_log_level('WARN', str(log_file))) == 2
+        assert query_cache.cache_info().updates == 1
+
+    def test_truncated_file_is_rescanned(self, log_file):
+        query_cache = cache.QueryCache()
+        assert len(query_cache.get_bid('1329', str(log_file))) == 2
+        log_file.write(LINES[2] + '\n')
+        assert query_cache.get_bid('1329', str(log_file)) == []
+        assert query_cache.cache_info().misses == 2
+
+    def test_byte_range(self, log_file):
+        query_cache = cache.QueryCache()
+        end = len(LINES[0]) + 1
+        assert len(query_cache.search(str(log_file), ('sid', '34523'), 0, end)) == 1
+        assert len(query_cache.search(str(log_file), ('sid', '34523'), end)) == 1
+
+    def test_dates_query(self, log_file):
+        query_cache = cache.QueryCache()
+        results = query_cache.get_dates('2012-09-13 16:04:00', '2012-09-13 16:05:00',
+                                        str(log_file))
+        assert [log.date for log in results] == ['2012-09-13 16:04:22', '2012-09-13 16:04:50']
+
+    def test_lru_eviction(self, log_file):
+        query_cache = cache.QueryCache(maxsize=2)
+        query_cache.get_rid('65d33', str(log_file))
+        query_cache.get_rid('54ff3', str(log_file))
+        query_cache.get_rid('65d33', str(log_file))
+        query_cache.get_rid('7a323', str(log_file))
+        query_cache.get_rid('65d33', str(log_file))
+        info = query_cache.cache_info()
+        assert (info.hits, info.misses, info.evictions, info.currsize) == (2, 3, 1, 2)
+
+    def test_max_items_eviction(self, log_file):
+        query_cache = cache.QueryCache(max_items=2)
+        query_cache.get_sid('34523', str(log_file))
+        query_cache.get_sid('42111', str(log_file))
+        assert query_cache.cache_info().evictions == 1
+
+    def test_invalidate(self, log_file):
+        query_cache = cache.QueryCache()
+        query_cache.get_sid('34523', str(log_file))
+        query_cache.invalidate(str(log_file))
+        assert query_cache.cache_info().currsize == 0
+
+    def test_bounded_range_picks_up_appended_lines(self, log_file):
+        query_cache = cache.QueryCache()
+        assert len(query_cache.search(str(log_file), ('sid', '34523'), 0, 10000)) == 2
+        log_file.write(LINES[0] + '\n' + LINES[1] + '\n', mode='a')
+        assert len(query_cache.search(str(log_file), ('sid', '34523'), 0, 10000)) == 4
+        assert query_cache.cache_info().updates == 1
+
+    def test_copytruncate_is_detected(self, log_file):
+        query_cache = cache.QueryCache()
+        assert len(query_cache.get_rid('65d33', str(log_file))) == 1
+        # truncated and grown past the cached offset before the next query
+        log_file.write('\n'.join([LINES[1], LINES[2], LINES[1], LINES[2]]) + '\n')
+        assert query_cache.get_rid('65d33', str(log_file)) == []
+        assert len(query_cache.get_rid('54ff3', str(log_file))) == 2
@@ -0,0 +1,103 @@
+"""
+
+Tests for `export` module.
+
+"""
+
+import csv
+import datetime
+import pytest
+from logjuggler import export
+from logjuggler import logjuggler
+
+
+LINES = [
+    "2012-09-13 16:04:22 DEBUG SID:34523 BID:1329 RID:65d33 'Starting new session'",
+    "2012-09-13 16:04:50 ERROR SID:34523 BID:1329 RID:54ff3 'Missing, \"quoted\" token'",
+    "2012-09-13 16:05:31 DEBUG SID:42111 BID:319 RID:86472 'Authenticating User'",
+    "2012-09-13 16:05:32 WARN SID:42111 BID:319 RID:7a323 'Invalid asset ID'",
+]
+
+
+class TestScanBatches(object):
+    def test_batches_are_columns(self):
+        batches = list(export.scan_batches(LINES, batch_size=3))
+        assert [len(batch[0]) for batch in batches] == [3, 1]
+        assert batches[0][1] == ('DEBUG', 'ERROR', 'DEBUG')
+        assert batches[1][0] == (datetime.datetime(2012, 9, 13, 16, 5, 32),)
+
+    def test_query(self):
+        for query in (('sid', '42111'), ('loglevel', 'DEBUG'),
+                      logjuggler.make_query('date', '2012-09-13 16:04:30',
+                                            '2012-09-13 16:05:31')):
+            columns = list(export.scan_batches(LINES, query))[0]
+            expected = list(logjuggler.search_results(
+                logjuggler.query_filter(query), logjuggler.parse_log_lines(LINES)))
+            assert list(columns[4]) == [log.request_id for log in expected]
+
+    def test_no_lines(self):
+        assert list(export.scan_batches([])) == []
+
+    @pytest.mark.parametrize('batch_size', [0, -1])
+    def test_batch_size_must_be_positive(self, batch_size):
+        with pytest.raises(ValueError):
+            export.scan_batches(LINES, batch_size=batch_size)
+
+
+class TestExport(object):
+    def test_csv(self, tmpdir):
+        path = str(tmpdir.join('out.csv'))
+        assert export.export_lines(LINES, path, query=('bid', '1329'), batch_size=1) == 2
+        with open(path) as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == list(logjuggler.Log._fields)
+        assert rows[2] == ['2012-09-13 16:04:50', 'ERROR', '34523', '1329', '54ff3',
+                           'Missing, "quoted" token']
+
+    def test_unknown_extension(self, tmpdir):
+        with pytest.raises(ValueError):
+            export.export_lines(LINES, str(tmpdir.join('out.xyz')))
+
+    @pytest.mark.parametrize('name', ['out.parquet', 'out.arrow'])
+    def test_arrow_formats(self, tmpdir, name):
+        pyarrow = pytest.importorskip('pyarrow')
+        path = str(tmpdir.join(name))
+        assert export.export_lines(LINES, path, batch_size=3) == 4
+        if name.endswith('.parquet'):
+            import pyarrow.parquet
+            table = pyarrow.parquet.read_table(path)
+        else:
+            table = pyarrow.RecordBatchFileReader(pyarrow.OSFile(path)).read_all()
+        assert table.num_rows == 4
+        assert table.column('request_id').to_pylist() == ['65d33', '54ff3', '86472', '7a323']
+        assert table.column('date').to_pylist()[0] == datetime.datetime(2012, 9, 13, 16, 4, 22)
+
+    def test_export_command(self, tmpdir):
+        log_file = tmpdir.join('app.log')
+        log_file.write('\n'.join(LINES) + '\n')
+        path = str(tmpdir.join('out.csv'))
+        assert logjuggler.main(['-f', str(log_file), 'export', path,
+                                '--query', 'loglevel', 'warn']) == 0
+        with open(path) as f:
+            assert len(list(csv.reader(f))) == 2
+
+    def test_export_command_missing_input(self, tmpdir, capsys):
+        path = tmpdir.join('out.csv')
+        assert logjuggler.main(['-f', str(tmpdir.join('missing.log')), 'export',
+                                str(path)]) == 1
+        assert not path.exists()
+
+    def test_export_command_batch_size(self, tmpdir):
+        log_file = tmpdir.join('app.log')
+        log_file.write('\n'.join(LINES) + '\n')
+        path = tmpdir.join('out.csv')
+        assert logjuggler.main(['-f', str(log_file), 'export', str(path),
+                                '--batch-size', '0']) == 1
+        assert not path.exists()
+
+    def test_export_command_unknown_format(self, tmpdir):
+        log_file = tmpdir.join('app.log')
+        log_file.write('not a log line\n')
+        path = tmpdir.join('out.csv')
+        assert logjuggler.main(['-f', str(log_file), 'export', str(path)]) == 1
+        assert not path.exists()
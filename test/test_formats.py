@@ -0,0 +1,116 @@
+"""
+
+Tests for `formats` module.
+
+"""
+
+import datetime
+import pytest
+from logjuggler import formats
+from logjuggler import logjuggler
+
+
+@pytest.fixture
+def log_line():
+    return "2012-09-13 16:04:22 DEBUG SID:34523 BID:1329 RID:65d33 'Starting new session'"
+
+
+@pytest.fixture
+def tid_line():
+    return "2012-09-13 16:04:22 DEBUG SID:34523 BID:1329 RID:65d33 TID:7 'Starting new session'"
+
+
+@pytest.fixture
+def iso_line():
+    return "2012-09-13T16:04:22.125 DEBUG SID:34523 BID:1329 RID:65d33 'Starting new session'"
+
+
+class TestLogFormat(object):
+    def test_default_format_matches_legacy_parsers(self, log_line):
+        extract = formats.get_format('default').extractor()
+        assert extract(log_line) == (
+            logjuggler.log_time(log_line), logjuggler.log_level(log_line),
+            logjuggler.session_id(log_line), logjuggler.business_id(log_line),
+            logjuggler.request_id(log_line), logjuggler.log_message(log_line))
+
+    def test_extra_fields_are_dropped(self, tid_line):
+        extract = formats.get_format('tid').extractor()
+        assert extract(tid_line)[1:] == ('DEBUG', '34523', '1329', '65d33',
+                                         'Starting new session')
+
+    def test_iso_timestamp_with_milliseconds(self, iso_line):
+        extract = formats.get_format('iso8601').extractor()
+        assert extract(iso_line)[0] == datetime.datetime(2012, 9, 13, 16, 4, 22, 125000)
+
+    def test_not_matching_line(self, tid_line):
+        extract = formats.get_format('default').extractor()
+        assert extract(tid_line) is None
+
+    def test_missing_fields_are_none(self):
+        log_format = formats.LogFormat('short', "{date} {time} {level} {message}")
+        extract = log_format.extractor(logjuggler.Log._make)
+        log = extract("2012-09-13 16:04:22 WARN disk full")
+        assert log.level == 'WARN'
+        assert log.message == 'disk full'
+        assert log.session_id is None
+
+    def test_pattern_without_time_is_invalid(self):
+        with pytest.raises(ValueError):
+            formats.LogFormat('broken', "{level} {message}")
+
+    def test_duplicated_placeholder_is_invalid(self):
+        with pytest.raises(ValueError):
+            formats.LogFormat('broken', "{date} {time} {level} {level}")
+
+
+class TestDetectFormat(object):
+    def test_detect_default(self, log_line):
+        assert formats.detect_format([log_line]).name == 'default'
+
+    def test_detect_tid(self, log_line, tid_line):
+        assert formats.detect_format([tid_line, tid_line, log_line]).name == 'tid'
+
+    def test_detect_iso8601(self, iso_line):
+        assert formats.detect_format([iso_line]).name == 'iso8601'
+
+    def test_unknown_format(self):
+        assert formats.detect_format(['not a log line']) is None
+
+
+class TestParseLogLines(object):
+    def test_parse_detected_format(self, iso_line):
+        logs = list(logjuggler.parse_log_lines([iso_line, iso_line]))
+        assert len(logs) == 2
+        assert logs[0].request_id == '65d33'
+
+    def test_parse_named_format_skips_other_lines(self, log_line, tid_line):
+        logs = list(logjuggler.parse_log_lines([log_line, tid_line], 'default'))
+        assert len(logs) == 1
+
+    def test_undetectable_format(self):
+        with pytest.raises(ValueError):
+            list(logjuggler.parse_log_lines(['not a log line']))
+
+    def test_parse_log_file(self, tmpdir, log_line):
+        log_file = tmpdir.join('app.log')
+        log_file.write(log_line + '\n' + log_line + '\n')
+        logs = list(logjuggler.parse_log_file(str(log_file)))
+        assert [log.session_id for log in logs] == ['34523', '34523']
+
+
+class TestInterning(object):
+    def test_ids_are_shared_between_records(self, log_line):
+        extract = formats.get_format('default').extractor()
+        first, second = extract(log_line), extract(log_line)
+        for field in range(1, 5):
+            assert first[field] is second[field]
+
+    def test_interning_can_be_disabled(self, log_line):
+        extract = formats.get_format('default').extractor(intern_fields=False)
+        assert extract(log_line)[2] is not extract(log_line)[2]
+
+    def test_filters_match_not_interned_values(self):
+        log = logjuggler.Log(None, 'DE' + 'BUG'.lower().upper(), ''.join(['345', '23']),
+                             '1329', '65d33', '')
+        assert logjuggler.log_level_filter('debug')(log) is log
+        assert logjuggler.session_id_filter(34523)(log) is log
@@ -5,6 +5,10 @@ Tests for `logjuggler` module.
 """
 
 import datetime
+import os
+import subprocess
+import sys
+
 import pytest
 from logjuggler import logjuggler
 
@@ -168,3 +172,86 @@ class TestSearchResults(object):
         search_result = logjuggler.search_results(test_filter, log_lines)
         assert isinstance([item for item in search_result][0].date, str)
 
+
+class TestMakeQuery(object):
+    def test_log_level_is_normalized(self):
+        assert logjuggler.make_query('loglevel', 'error') == ('loglevel', 'ERROR')
+
+    def test_ids_are_strings(self):
+        assert logjuggler.make_query('bid', 1329) == ('bid', '1329')
+
+    def test_dates_are_parsed(self):
+        assert logjuggler.make_query('date', '2012-09-13 16:04:22', '2012-09-14 16:04:22') ==\
+            ('date', datetime.datetime(2012, 9, 13, 16, 4, 22),
+             datetime.datetime(2012, 9, 14, 16, 4, 22))
+
+    def test_unknown_query(self):
+        with pytest.raises(ValueError):
+            logjuggler.make_query('tid', '1')
+
+    def test_wrong_number_of_arguments(self):
+        with pytest.raises(ValueError):
+            logjuggler.make_query('date', '2012-09-13 16:04:22')
+
+    def test_query_filter(self, log_lines):
+        test_filter = logjuggler.query_filter(logjuggler.make_query('sid', 42111))
+        assert len(list(logjuggler.search_results(test_filter, log_lines))) == 2
+
+
+class TestMain(object):
+    @pytest.fixture
+    def log_file(self, tmpdir):
+        log_file = tmpdir.join('app.log')
+        log_file.write(
+            "2012-09-13 16:04:22 DEBUG SID:34523 BID:1329 RID:65d33 'Starting new session'\n"
+            "2012-09-13 16:04:50 ERROR SID:34523 BID:1329 RID:54ff3 'Missing token'\n")
+        return str(log_file)
+
+    def test_query(self, log_file, capsys):
+        assert logjuggler.main(['-f', log_file, 'loglevel', 'ERROR']) == 0
+        out, _ = capsys.readouterr()
+        assert out == ("2012-09-13 16:04:50 ERROR sid:34523 bid:1329 rid:54ff3 "
+                       "message:Missing token\n")
+
+    def test_date_query(self, log_file, capsys):
+        assert logjuggler.main(['-f', log_file, 'date', '2012-09-13 16:04:00',
+                                '2012-09-13 16:04:30']) == 0
+        out, _ = capsys.readouterr()
+        assert out.count('\n') == 1
+
+    def test_crlf_line_endings(self, tmpdir, capsys):
+        log_file = tmpdir.join('crlf.log')
+        log_file.write(
+            "2012-09-13 16:04:22 DEBUG SID:34523 BID:1329 RID:65d33 'Starting new session'\r\n"
+            "2012-09-13 16:04:50 ERROR SID:34523 BID:1329 RID:54ff3 'Missing token'\r\n",
+            mode='wb')
+        assert logjuggler.main(['-f', str(log_file), 'sid', '34523']) == 0
+        out, _ = capsys.readouterr()
+        assert out.count('\n') == 2
+        assert '\r' not in out
+
+    @pytest.mark.skipif('sys.version_info < (2, 7)')
+    def test_python_m(self, log_file):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(logjuggler.__file__)))
+        process = subprocess.Popen([sys.executable, '-m', 'logjuggler', '-f', log_file,
+                                    'rid', '65d33'], stdout=subprocess.PIPE, cwd=root)
+        out = process.communicate()[0]
+        assert process.returncode == 0
+        assert out.count(b'rid:65d33') == 1
+
+    def test_batch(self, log_file, tmpdir, capsys):
+        queries = tmpdir.join('queries')
+        queries.write("sid 34523\n\n# comment\nrid 65d33\n")
+        assert logjuggler.main(['-f', log_file, 'batch', str(queries)]) == 0
+        out, _ = capsys.readouterr()
+        lines = out.splitlines()
+        assert lines[0] == '# sid 34523'
+        assert lines[3] == '# rid 65d33'
+        assert len(lines) == 5
+
+    def test_batch_malformed_query(self, log_file, capsys):
+        errors = logjuggler.run_batch(['bid', "date '2012-09-13 16:04:00'", 'bid 1329'],
+                                      logjuggler.parse_log_file(log_file))
+        assert errors == 2
+        out, _ = capsys.readouterr()
+        assert out.count('bid:1329') == 2
@@ -0,0 +1,124 @@
+"""
+
+Tests for `shards` module.
+
+"""
+
+import pytest
+from logjuggler import logjuggler
+from logjuggler import shards
+
+
+LINES = [
+    "2012-09-13 16:04:22 DEBUG SID:34523 BID:1329 RID:65d33 'Starting new session'",
+    "2012-09-13 16:04:30 DEBUG SID:34523 BID:1329 RID:54f22 'Authenticating User'",
+    "2012-09-13 16:05:30 DEBUG SID:42111 BID:319 RID:65a23 'Starting new session'",
+    "2012-09-13 16:04:50 ERROR SID:34523 BID:1329 RID:54ff3 'Missing Authentication token'",
+    "2012-09-13 16:05:31 DEBUG SID:42111 BID:319 RID:86472 'Authenticating User'",
+    "2012-09-13 16:05:31 DEBUG SID:42111 BID:319 RID:7a323 'Deleting asset with ID 543234'",
+    "2012-09-13 16:05:32 WARN SID:42111 BID:319 RID:7a323 'Invalid asset ID'",
+]
+
+QUERIES = [
+    ('loglevel', 'DEBUG'),
+    ('loglevel', 'INFO'),
+    ('sid', '42111'),
+    ('bid', '1329'),
+    ('rid', '7a323'),
+    logjuggler.make_query('date', '2012-09-13 16:04:30', '2012-09-13 16:05:31'),
+]
+
+
+@pytest.fixture
+def log_files(tmpdir):
+    files = []
+    for name, lines in (('a.log', LINES[:4]), ('b.log', LINES[4:])):
+        log_file = tmpdir.join(name)
+        log_file.write('\n'.join(lines) + '\n')
+        files.append(str(log_file))
+    return files
+
+
+def expected(files, query):
+    logs = [log for f in files for log in logjuggler.parse_log_file(f)]
+    return sorted(logjuggler.search_results(logjuggler.query_filter(query), logs),
+                  key=lambda log: log.date)
+
+
+class TestSplitRanges(object):
+    def test_ranges_are_aligned_to_lines(self, log_files):
+        ranges = shards.split_ranges(log_files[0], 3)
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == sum(len(line) + 1 for line in LINES[:4])
+        with open(log_files[0], 'rb') as f:
+            data = f.read()
+        for start, end in ranges:
+            assert start == 0 or data[start - 1:start] == b'\n'
+
+    def test_more_parts_than_lines(self, log_files):
+        assert len(shards.split_ranges(log_files[1], 10)) == 3
+
+
+class TestShard(object):
+    def test_rows_are_sorted_by_timestamp(self, log_files):
+        shard = shards.build_shard(log_files[0])
+        assert [row[4] for row in shard['rows']] == ['65d33', '54f22', '54ff3', '65a23']
+        assert shard['format'] == 'default'
+
+    def test_last_line_without_newline_is_indexed(self, tmpdir):
+        log_file = tmpdir.join('app.log')
+        log_file.write('\n'.join(LINES[:2]))
+        shard = shards.build_shard(str(log_file))
+        assert len(shard['rows']) == 2
+        assert shard['sources'][0]['end'] == log_file.size()
+
+    def test_query_shard(self, log_files):
+        shard = shards.build_shard(log_files[0])
+        for query in QUERIES:
+            assert shards.query_shard(shard, query) == expected(log_files[:1], query)
+
+    def test_write_and_load(self, log_files, tmpdir):
+        path = str(tmpdir.join('a.shard.json'))
+        shards.write_shard(shards.build_shard(log_files[0]), path)
+        results = shards.query_shard(path, ('sid', '34523'))
+        assert results == expected(log_files[:1], ('sid', '34523'))
+        assert isinstance(results[0].level, str)
+
+    def test_unsupported_version(self, tmpdir):
+        path = tmpdir.join('bad.shard.json')
+        path.write('{"version": 99}')
+        with pytest.raises(ValueError):
+            shards.load_shard(str(path))
+
+    def test_merge_shards(self, log_files):
+        merged = shards.merge_shards([shards.build_shard(f) for f in log_files])
+        assert len(merged['sources']) == 2
+        for query in QUERIES:
+            assert shards.query_shard(merged, query) == expected(log_files, query)
+
+
+class TestParallelShards(object):
+    def test_build_and_query_with_processes(self, log_files, tmpdir):
+        paths = shards.build_shards(log_files, str(tmpdir.join('shards')),
+                                    processes=3, parts=2)
+        assert len(paths) == 4
+        for query in QUERIES:
+            assert shards.query_shards(paths, query, processes=3) == expected(log_files, query)
+
+    def test_main(self, log_files, tmpdir, capsys):
+        out_dir = str(tmpdir.join('shards'))
+        assert shards.main(['--processes', '1', 'build', out_dir] + log_files) == 0
+        paths, _ = capsys.readouterr()
+        assert shards.main(['query', 'loglevel WARN'] + paths.split()) == 0
+        out, _ = capsys.readouterr()
+        assert out == ("2012-09-13 16:05:32 WARN sid:42111 bid:319 rid:7a323 "
+                       "message:Invalid asset ID\n")
+
+    def test_main_processes_after_command(self, log_files, tmpdir, capsys):
+        out_dir = str(tmpdir.join('shards'))
+        assert shards.main(['build', out_dir] + log_files + ['--processes', '2', '--parts', '2']) == 0
+        paths, _ = capsys.readouterr()
+        assert len(paths.split()) == 4
+        assert shards.main(['query', 'sid 42111'] + paths.split() + ['--processes', '2']) == 0
+        out, _ = capsys.readouterr()
+        assert out.count('\n') == 4